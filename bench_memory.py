@@ -0,0 +1,143 @@
+#!python3
+''' Memory benchmarks: parse and solve each day's generated inputs
+    at increasing sizes, and check how memory grows with input size.
+
+    python bench_memory.py                     # Check against the baseline
+    python bench_memory.py --days 3 4 --output memory.json
+    python bench_memory.py --update-baseline
+
+    Each measurement runs in a fresh process, so that its peak RSS
+    is its own: once plainly, for the peak RSS,
+    and once under tracemalloc, for the peak of traced memory
+    and the lines that had allocated the most by the end.
+    Growth is the slope of peak traced memory against input bytes,
+    from the smallest input to the largest;
+    a day fails if its growth goes over the baseline's by `--tolerance`.
+'''
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from runner import discover, load_day
+
+root = Path(__file__).resolve().parent
+baseline_path = root / 'bench_memory_baseline.json'
+
+# Input sizes to try, by day, in the units of each day's `generate`
+sizes = {
+    1: [10_000, 30_000, 100_000],  # Lines
+    2: [10_000, 30_000, 100_000],  # Games
+    3: [100, 300, 1_000],          # Rows (and columns)
+    4: [10_000, 30_000, 100_000],  # Cards
+    5: [100, 300, 1_000],          # Ranges per map
+}
+
+
+def max_rss() -> int:
+    ''' Peak resident set size of this process so far, in bytes.
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(day: int, path: str, traced: bool, top: int = 5) -> dict:
+    ''' Parse and solve both parts of `day` on `path`,
+        in the current (fresh) process.
+    '''
+    module = load_day(day)
+    before = max_rss()
+    if traced:
+        tracemalloc.start()
+    parsed = module.load(path)
+    answers = [module.solve(parsed, part) for part in (1, 2)]
+    if not traced:
+        return {'peak_rss_bytes': max_rss() - before}
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del parsed, answers
+    return {'peak_traced_bytes': peak,
+            'retained_bytes': current,
+            'top_allocators': [
+                {'where': str(stat.traceback), 'bytes': stat.size,
+                 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:top]]}
+
+
+def in_fresh_process(function, *args):
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(function, *args).result()
+
+
+def benchmark(day: int, directory) -> dict:
+    ''' Memory use of `day` at each of its sizes, and its growth.
+    '''
+    module = load_day(day)
+    results = []
+    for size in sizes[day]:
+        path = Path(directory) / f'day-{day}-{size}.txt'
+        with open(path, 'w') as file:
+            file.writelines(module.generate(size))
+        result = {'size': size, 'input_bytes': os.path.getsize(path)}
+        result |= in_fresh_process(measure, day, str(path), False)
+        result |= in_fresh_process(measure, day, str(path), True)
+        results.append(result)
+        path.unlink()
+    first, last = results[0], results[-1]
+    growth = (last['peak_traced_bytes'] - first['peak_traced_bytes']) \
+           / (last['input_bytes'] - first['input_bytes'])
+    return {'day': day, 'bytes_per_input_byte': growth, 'runs': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--days', type=int, nargs='+',
+                        help='days to run (default: all of them)')
+    parser.add_argument('--output', type=Path,
+                        help='where to write the results (default: stdout)')
+    parser.add_argument('--baseline', type=Path, default=baseline_path)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed growth over the baseline, as a fraction')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    days = args.days or [day for day in discover() if day in sizes]
+    with tempfile.TemporaryDirectory() as directory:
+        results = [benchmark(day, directory) for day in days]
+
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + '\n')
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    if args.update_baseline:
+        for result in results:
+            baseline[str(result['day'])] = result['bytes_per_input_byte']
+        args.baseline.write_text(json.dumps(baseline, indent=2) + '\n')
+        return 0
+
+    failures = 0
+    for result in results:
+        allowed = baseline.get(str(result['day']))
+        growth = result['bytes_per_input_byte']
+        if allowed is not None and growth > allowed * (1 + args.tolerance):
+            print(f'Day {result["day"]}: memory grows by {growth:.2f}'
+                  f' bytes per input byte, over the baseline of'
+                  f' {allowed:.2f}', file=sys.stderr)
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
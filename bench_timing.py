@@ -0,0 +1,200 @@
+#!python3
+''' Timing benchmarks: run each solver on generated inputs of several sizes,
+    with warm-up and repeats, and fit how its time grows with input size.
+
+    python bench_timing.py --output timing.json
+    python bench_timing.py --cases day3-neighbours day4-cascade --repeats 9
+    python bench_timing.py --compare before.json after.json
+
+    For each case and size the median and 95th percentile are reported,
+    and the exponent k of time ~ (input bytes)**k is fitted
+    by least squares on a log-log scale:
+    about 1 for linear work, about 2 for quadratic work.
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from runner import discover, load_day
+
+
+def solve_case(day: int, part: int):
+    ''' The day's own `load` and `solve`, solve only being timed.
+    '''
+    module = load_day(day)
+    return module.load, lambda parsed: module.solve(parsed, part)
+
+
+def neighbours_case():
+    ''' Day 3 part numbers found by comparing every number with every symbol.
+    '''
+    Day3 = load_day(3)
+
+    def prepare(path):
+        with open(path) as file:
+            lines = [line.strip() for line in file]
+        return ([*Day3.get_number_spans(lines)],
+                [*Day3.get_symbol_spans(lines)])
+
+    def run(spans):
+        number_spans, symbol_spans = spans
+        return sum(number for number, i, span in number_spans
+                   if any(Day3.neighbours((number, i, span), symbol_spans)))
+
+    return prepare, run
+
+
+def cascade_case():
+    Day4 = load_day(4)
+
+    def prepare(path):
+        with open(path, 'rb') as file:
+            return list(Day4.parse_cards(file))
+
+    def run(cards):
+        return sum(Day4.process_scratchcards(cards).values())
+
+    return prepare, run
+
+
+def seed2location_case():
+    ''' Day 5 part 1, one `make_seed2location` call per seed,
+        with as many seed ranges as ranges in each map.
+        The compiled almanac is dropped before each run,
+        so that every run compiles it (once, if all is well) and looks up.
+    '''
+    Day5 = load_day(5)
+
+    def generate(size):
+        return Day5.generate(size, seeds=size)
+
+    def prepare(path):
+        with open(path) as file:
+            return Day5.parse_almanac(file)
+
+    def run(information):
+        information.pop('compiled', None)
+        return min(Day5.make_seed2location(information, seed)
+                   for seed in information['seeds'])
+
+    return prepare, run, generate
+
+
+# Benchmark cases: (day, sizes for its `generate`, setup).
+# Setup returns `prepare` and `run`, and may add its own `generate`.
+cases = {
+    'day1-part1':         (1, [2_000, 8_000, 32_000], lambda: solve_case(1, 1)),
+    'day1-part2':         (1, [2_000, 8_000, 32_000], lambda: solve_case(1, 2)),
+    'day2-part1':         (2, [2_000, 8_000, 32_000], lambda: solve_case(2, 1)),
+    'day2-part2':         (2, [2_000, 8_000, 32_000], lambda: solve_case(2, 2)),
+    'day3-part1':         (3, [50, 100, 200],         lambda: solve_case(3, 1)),
+    'day3-part2':         (3, [50, 100, 200],         lambda: solve_case(3, 2)),
+    'day3-neighbours':    (3, [40, 80, 160],          neighbours_case),
+    'day4-part1':         (4, [2_000, 8_000, 32_000], lambda: solve_case(4, 1)),
+    'day4-part2':         (4, [2_000, 8_000, 32_000], lambda: solve_case(4, 2)),
+    'day4-cascade':       (4, [2_000, 8_000, 32_000], cascade_case),
+    'day5-part1':         (5, [50, 200, 800],         lambda: solve_case(5, 1)),
+    'day5-part2':         (5, [50, 200, 800],         lambda: solve_case(5, 2)),
+    'day5-seed2location': (5, [50, 200, 800],         seed2location_case),
+}
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(fraction * len(values)) - 1)]
+
+
+def exponent(xs, ys) -> float:
+    ''' The slope of log(ys) against log(xs), by least squares.
+    '''
+    xs = [math.log(x) for x in xs]
+    ys = [math.log(max(y, 1e-9)) for y in ys]
+    mx, my = statistics.fmean(xs), statistics.fmean(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) \
+         / sum((x - mx) ** 2 for x in xs)
+
+
+def benchmark(name: str, directory, warmups=1, repeats=5) -> dict:
+    day, sizes, setup = cases[name]
+    prepare, run, *own = setup()
+    # Inputs of the day's own `generate` are shared between cases
+    generate = own[0] if own else load_day(day).generate
+    stem = name if own else f'day-{day}'
+    results = []
+    for size in sizes:
+        path = Path(directory) / f'{stem}-{size}.txt'
+        if not path.exists():
+            with open(path, 'w') as file:
+                file.writelines(generate(size))
+        state = prepare(path)
+        for _ in range(warmups):
+            run(state)
+        seconds = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            run(state)
+            seconds.append(time.perf_counter() - started)
+        results.append({'size': size, 'input_bytes': os.path.getsize(path),
+                        'median_seconds': statistics.median(seconds),
+                        'p95_seconds': percentile(seconds, 0.95)})
+    return {'case': name, 'day': day,
+            'exponent': exponent([r['input_bytes']    for r in results],
+                                 [r['median_seconds'] for r in results]),
+            'sizes': results}
+
+
+def compare(before: dict, after: dict):
+    ''' Print how each case's largest size and exponent changed.
+    '''
+    old = {result['case']: result for result in before['results']}
+    for result in after['results']:
+        if (previous := old.get(result['case'])) is None:
+            continue
+        then, now = previous['sizes'][-1], result['sizes'][-1]
+        ratio = now['median_seconds'] / then['median_seconds']
+        print(f'{result["case"]:20} {ratio:6.2f}x time'
+              f'   exponent {previous["exponent"]:.2f}'
+              f' -> {result["exponent"]:.2f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--cases', nargs='+', choices=list(cases),
+                        help='cases to run (default: all of them)')
+    parser.add_argument('--warmups', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', type=Path,
+                        help='where to write the results (default: stdout)')
+    parser.add_argument('--compare', type=Path, nargs=2,
+                        metavar=('BEFORE', 'AFTER'),
+                        help='compare two earlier results instead')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        before, after = (json.loads(path.read_text())
+                         for path in args.compare)
+        compare(before, after)
+        return
+
+    names = [name for name in args.cases or cases
+             if cases[name][0] in discover()]
+    with tempfile.TemporaryDirectory() as directory:
+        results = [benchmark(name, directory, args.warmups, args.repeats)
+                   for name in names]
+    text = json.dumps({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'results': results}, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
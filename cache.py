@@ -0,0 +1,143 @@
+#!python3
+''' An on-disk cache of answers, and of parsed inputs,
+    so that solving an unchanged input again costs only a lookup.
+
+    Entries are keyed by day, part, solver version and input:
+    the solver version is the SHA-256 of the day's source file
+    and the input is identified by the SHA-256 of its contents,
+    so editing either one simply misses the cache.
+    Entries live in one SQLite database, which any number of processes
+    may share; the least recently used entries are dropped
+    once the total size of the cached values goes over a limit.
+'''
+import hashlib
+import pickle
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+default_path = Path(__file__).resolve().parent / '.cache' / 'answers.sqlite'
+default_max_bytes = 256 * 2 ** 20
+
+
+def file_digest(path) -> str:
+    ''' The SHA-256 of the contents of the file at `path`.
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def solver_version(module) -> str:
+    ''' The SHA-256 of the source of a day's solver module.
+    '''
+    return file_digest(module.__file__)
+
+
+class AnswerCache:
+    ''' Pickled values by key, in the SQLite database at `path`,
+        holding no more than `max_bytes` of values at a time.
+    '''
+
+    def __init__(self, path=default_path, max_bytes=default_max_bytes):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; transactions are opened explicitly below
+        self.connection = sqlite3.connect(self.path, timeout=60,
+                                          isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key   TEXT PRIMARY KEY,
+                value BLOB    NOT NULL,
+                size  INTEGER NOT NULL,
+                used  REAL    NOT NULL)''')
+
+    @staticmethod
+    def key(day: int, part, version: str, digest: str) -> str:
+        ''' The key of an answer (`part` 1 or 2)
+            or of a parsed input (`part` 'parsed').
+        '''
+        return f'{day}/{part}/{version}/{digest}'
+
+    def get(self, key: str, default=None):
+        row = self.connection.execute(
+            'SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        self.connection.execute(
+            'UPDATE entries SET used = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key: str, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self.transaction():
+            self.connection.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                (key, blob, len(blob), time.time()))
+            self.evict()
+
+    def evict(self):
+        ''' Drop the least recently used entries
+            until the cached values fit in `max_bytes`.
+        '''
+        total, = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        rows = self.connection.execute(
+            'SELECT key, size FROM entries ORDER BY used').fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.connection.execute('DELETE FROM entries WHERE key = ?',
+                                    (key,))
+            total -= size
+
+    def transaction(self):
+        return _Transaction(self.connection)
+
+    def clear(self):
+        with self.transaction():
+            self.connection.execute('DELETE FROM entries')
+
+    def close(self):
+        self.connection.close()
+
+
+class _Transaction:
+    ''' Take the database's write lock up front,
+        so that concurrent writers queue instead of failing mid-way.
+    '''
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, kind, value, traceback):
+        self.connection.execute('COMMIT' if kind is None else 'ROLLBACK')
+
+
+def test():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AnswerCache(Path(directory) / 'cache.sqlite', max_bytes=64)
+        key = AnswerCache.key(5, 1, 'version', 'digest')
+        assert cache.get(key) is None
+        cache.put(key, 2 ** 70)
+        assert cache.get(key) == 2 ** 70
+        # Filling the cache pushes out the least recently used entries
+        for n in range(20):
+            cache.put(f'key {n}', n)
+        assert cache.get(key) is None
+        assert cache.get('key 19') == 19
+        cache.close()
+
+
+if __name__ == '__main__':
+    test()
@@ -1,9 +1,100 @@
 #!python3
 ''' Advent of Code 2023 --- Day 1
 '''
+import mmap
+import os
+import random
+import time
+from collections import deque
+from multiprocessing import Pool
+
+english = ['one', 'two', 'three', 'four', 'five', 
+           'six', 'seven', 'eight', 'nine']
+
+
+def make_scanner(words: dict[str, int]):
+    ''' A function that finds, in one left-to-right pass over a line,
+        which of `words` appears first, and returns that word's value
+        (or None if there is none).
+        The words are compiled into an Aho--Corasick automaton
+        with every failure transition resolved in advance,
+        so that each character costs a single lookup.
+    '''
+    # Trie
+    delta  = [{}]    # delta[state][char] -> state
+    output = [None]  # output[state] -> value of the word ending there
+    for word, value in words.items():
+        state = 0
+        for char in word:
+            if char not in delta[state]:
+                delta[state][char] = len(delta)
+                delta .append({})
+                output.append(None)
+            state = delta[state][char]
+        output[state] = value
+
+    # Failure transitions, breadth first
+    alphabet = {char for word in words for char in word}
+    fail = [0] * len(delta)
+    queue = deque(delta[0].values())
+    while queue:
+        state = queue.popleft()
+        if output[state] is None:
+            output[state] = output[fail[state]]
+        # Shallower states are already resolved, so one lookup will do
+        for char, target in delta[state].items():
+            fail[target] = delta[fail[state]].get(char, 0)
+            queue.append(target)
+        for char in alphabet - delta[state].keys():
+            if (target := delta[fail[state]].get(char, 0)):
+                delta[state][char] = target
+
+    def scan(line: str):
+        state = 0
+        for char in line:
+            state = delta[state].get(char, 0)
+            if (value := output[state]) is not None:
+                return value
+        return None
+
+    return scan
+
+
+def make_calibration(words: dict[str, int]):
+    ''' A function giving the calibration value of a line:
+        its first digit, from a forward scan,
+        and its last digit, from a scan of the reversed line.
+        Overlapping words such as `eightwo` are found from either end.
+        Words given as bytes make a function of lines of bytes.
+    '''
+    first = make_scanner(words)
+    last  = make_scanner({word[::-1]: value for word, value in words.items()})
+
+    def calibration(line: str) -> int:
+        return 10 * first(line) + last(line[::-1])
+
+    return calibration
+
+
+digits  = {str(i): i for i in range(10)}
+spelled = {word: i for i, word in enumerate(english, start=1)}
+calibration_part1 = make_calibration(digits)
+calibration_part2 = make_calibration(digits | spelled)
+# The same, for lines read in binary mode
+calibrations = {
+    1: make_calibration({word.encode(): i for word, i in digits.items()}),
+    2: make_calibration({word.encode(): i
+                         for word, i in (digits | spelled).items()}),
+}
 
 
 def calibration_values_part1(lines):
+    ''' `find_calibration_values_part1`, by automaton.
+    '''
+    return map(calibration_part1, lines)
+
+
+def find_calibration_values_part1(lines):
     ''' The newly-improved calibration document consists of lines of text;
         each line originally contained a specific calibration value 
         that the Elves now need to recover. 
@@ -28,6 +119,7 @@ def test1():
     for x, y in zip(values, (12, 38, 15, 77)):
         assert x == y
     assert sum(values) == 142
+    assert values == list(find_calibration_values_part1(test_input))
 
 
 def part1():
@@ -36,13 +128,17 @@ def part1():
 
 
 def calibration_values_part2(lines):
+    ''' `find_calibration_values_part2`, by automaton.
+    '''
+    return map(calibration_part2, lines)
+
+
+def find_calibration_values_part2(lines):
     ''' Some of the digits are actually spelled out with letters:
         one, two, three, four, five, six, seven, eight, and nine 
         also count as valid "digits".
     '''
 
-    english = ['one', 'two', 'three', 'four', 'five', 
-               'six', 'seven', 'eight', 'nine']
     eng2dec = lambda s: english.index(s) + 1
     digits = [str(i) for i in range(10)] + english
 
@@ -68,6 +164,10 @@ def test2():
     for x, y in zip(values, (29, 83, 13, 24, 42, 14, 76)):
         assert x == y, (x, y)
     assert sum(values) == 281
+    assert values == list(find_calibration_values_part2(test_input))
+    # Overlapping words
+    assert list(calibration_values_part2(['eightwo', 'twone', 'oneight'])) \
+        == [82, 21, 18]
 
 
 def part2():
@@ -75,10 +175,135 @@ def part2():
         print(sum(calibration_values_part2(file)))
 
 
+def benchmark(repeats: int = 100) -> dict:
+    ''' Seconds taken by each implementation
+        over `repeats` copies of the calibration document.
+    '''
+    with open('day-1/input.txt') as file:
+        lines = list(file) * repeats
+    timings = {}
+    for name, values in (
+            ('part1 find',      find_calibration_values_part1),
+            ('part1 automaton', calibration_values_part1),
+            ('part2 find',      find_calibration_values_part2),
+            ('part2 automaton', calibration_values_part2)):
+        started = time.perf_counter()
+        sum(values(lines))
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def _chunk_sum(path, start: int, stop: int, part: int) -> int:
+    ''' The sum of the calibration values on the lines
+        between byte offsets `start` and `stop` of the file at `path`.
+        Lines are read out of the mapping one at a time,
+        so only one line is ever copied.
+    '''
+    calibration = calibrations[part]
+    total = 0
+    with open(path, 'rb') as file, \
+         mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while start < stop:
+            end = data.find(b'\n', start, stop)
+            if end == -1:
+                end = stop
+            line = data[start:end]
+            if line.strip():
+                total += calibration(line)
+            start = end + 1
+    return total
+
+
+def chunks(path, count: int):
+    ''' Split the file at `path` into about `count` runs of whole lines,
+        as (start, stop) byte offsets.
+    '''
+    size = os.path.getsize(path)
+    if not size:
+        return []
+    with open(path, 'rb') as file, \
+         mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        bounds = [0]
+        for k in range(1, count):
+            newline = data.find(b'\n', max(size * k // count, bounds[-1]))
+            if newline == -1:
+                break
+            bounds.append(newline + 1)
+    bounds.append(size)
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:])
+            if start < stop]
+
+
+def chunked_sum(path, part: int, processes=None, chunks_per_process=4) -> int:
+    ''' The sum of the calibration values of a (possibly huge) document,
+        with the memory-mapped file cut into newline-aligned chunks
+        which are added up in a pool of worker processes.
+    '''
+    processes = processes or os.cpu_count()
+    tasks = [(path, start, stop, part)
+             for start, stop in chunks(path, processes * chunks_per_process)]
+    with Pool(processes) as pool:
+        return sum(pool.starmap(_chunk_sum, tasks))
+
+
+def benchmark_chunked(path='day-1/input.txt', part: int = 2,
+                      worker_counts=(1, 2, 4)) -> dict:
+    ''' Throughput of `chunked_sum` in MB/s, by number of workers.
+    '''
+    size = os.path.getsize(path)
+    throughput = {}
+    for processes in worker_counts:
+        started = time.perf_counter()
+        chunked_sum(path, part, processes)
+        throughput[processes] = size / 1e6 / (time.perf_counter() - started)
+    return throughput
+
+
+def test3():
+    for part, values in ((1, calibration_values_part1),
+                         (2, calibration_values_part2)):
+        with open('day-1/input.txt') as file:
+            expected = sum(values(file))
+        for processes in (1, 3):
+            assert chunked_sum('day-1/input.txt', part, processes) == expected
+    # A chunk may stop short of the end of its last line
+    with open('day-1/input.txt', 'rb') as file:
+        line = file.readline()
+    assert _chunk_sum('day-1/input.txt', 0, len(line) - 1, 2) \
+        == calibrations[2](line)
+
+
+def generate(size: int, seed: int = 0):
+    ''' A made-up calibration document of `size` lines,
+        one line at a time, with letters, spelled-out digits
+        and at least one digit on every line.
+        The same seed always gives the same document.
+    '''
+    rng = random.Random(seed)
+    pieces = [*'abcdefghijklmnopqrstuvwxyz', *english]
+    for _ in range(size):
+        parts = rng.choices(pieces, k=rng.randint(2, 12))
+        for _ in range(rng.randint(1, 3)):
+            parts.insert(rng.randint(0, len(parts)), str(rng.randint(1, 9)))
+        yield ''.join(parts) + '\n'
+
+
+def load(path):
+    ''' The lines of the calibration document at `path`, as bytes.
+    '''
+    with open(path, 'rb') as file:
+        return [line for line in file if line.strip()]
+
+
+def solve(lines, part: int) -> int:
+    return sum(map(calibrations[part], lines))
+
+
 if __name__ == '__main__':
     test1()
     part1()
     test2()
     part2()
+    test3()
 
 
@@ -1,7 +1,12 @@
 #!python3
 ''' Advent of Code 2023 Day 2
 '''
+import mmap
+import random
 import re
+import time
+from array import array
+from bisect import bisect_right
 from functools import reduce
 
 Color = str
@@ -24,29 +29,66 @@ def parse(lines):
         of sets of cubes revealed from the bag
         (e.g. 3 red, 5 green, 4 blue).
     '''
-
-    # Patterns
-    game_pattern = re.compile(r'Game (\d+): (.*)')
-    spec_pattern = re.compile(r'(\d+) (red|green|blue)')
-
-    for line in map(str.strip, lines):
-        match = game_pattern.fullmatch(line)
-        assert match is not None, line
-        game_number, rounds = match.groups()
-        rounds = rounds.split('; ')
-        game = []
-        for round_ in rounds:
-            rgb = {color: 0 for color in colors}
-            specs = round_.split(', ')
-            for spec in specs:
-                match = spec_pattern.fullmatch(spec)
-                assert match is not None
-                count, color = match.groups()
-                rgb[color] = int(count)
-            game.append(rgb)
+    for line in lines:
+        game_number, game = parse_game(line)
         yield game
 
 
+# Patterns
+game_pattern = re.compile(r'Game (\d+): (.*)')
+spec_pattern = re.compile(r'(\d+) (red|green|blue)')
+
+
+def parse_game(line: str) -> tuple[int, Game]:
+    ''' The ID and rounds of the game on one line.
+    '''
+    match = game_pattern.fullmatch(line.strip())
+    assert match is not None, line
+    game_number, rounds = match.groups()
+    rounds = rounds.split('; ')
+    game = []
+    for round_ in rounds:
+        rgb = {color: 0 for color in colors}
+        specs = round_.split(', ')
+        for spec in specs:
+            match = spec_pattern.fullmatch(spec)
+            assert match is not None
+            count, color = match.groups()
+            rgb[color] = int(count)
+        game.append(rgb)
+    return int(game_number), game
+
+
+color_columns = {color.encode(): c for c, color in enumerate(colors)}
+
+
+def parse_game_bytes(line: bytes):
+    ''' The ID of the game on one line read in binary mode,
+        and its rounds as (red, green, blue) lists,
+        found without building any dicts or running any regex.
+        Lines that are not laid out exactly as `parse_game` expects
+        are decoded and handed to it, to be parsed or turned down.
+    '''
+    head, colon, body = line.strip().partition(b': ')
+    if colon and head.startswith(b'Game ') and head[5:].isdigit():
+        try:
+            rounds = []
+            for round_ in body.split(b'; '):
+                rgb = [0, 0, 0]
+                for spec in round_.split(b', '):
+                    count, color = spec.split(b' ')
+                    if not count.isdigit():
+                        raise ValueError(count)
+                    rgb[color_columns[color]] = int(count)
+                rounds.append(rgb)
+            return int(head[5:]), rounds
+        except (KeyError, ValueError):
+            pass
+    game_number, game = parse_game(line.decode())
+    return game_number, [[round_[color] for color in colors]
+                         for round_ in game]
+
+
 def game_is_possible(game: Game, bag: CubeSet) -> bool:
     ''' Could this game occur with the given bag?
     '''
@@ -66,6 +108,167 @@ def possible_game_ids(lines):
     return possible_games
 
 
+class GameTable:
+    ''' Many games, stored by column rather than as dicts:
+        `counts` holds the red, green and blue counts of every round
+        of every game, one after another, three to a round;
+        the rounds of game k are rounds offsets[k] to offsets[k + 1];
+        and its ID is ids[k].
+        The columns are unsigned 32-bit,
+        so IDs and counts must be below 2**32.
+    '''
+
+    def __init__(self, games=(), ids=None):
+        self.ids     = array('I')
+        self.offsets = array('I', [0])
+        self.counts  = array('I')
+        numbered = enumerate(games, start=1) if ids is None \
+              else zip(ids, games)
+        for game_id, game in numbered:
+            self.append(game_id, ((round_[color] for color in colors)
+                                  for round_ in game))
+
+    def append(self, game_id: int, rounds):
+        ''' Add a game, given its ID and its rounds as (red, green, blue).
+            A game that does not fit in the columns is not added.
+        '''
+        size = len(self.counts)
+        try:
+            for rgb in rounds:
+                self.counts.extend(rgb)
+            self.ids.append(game_id)
+        except OverflowError:
+            del self.counts[size:]
+            raise OverflowError(f'Game {game_id}: a GameTable only holds'
+                                f' IDs and counts from 0 to {2 ** 32 - 1}') \
+                from None
+        self.offsets.append(len(self.counts) // 3)
+
+    @classmethod
+    def from_bytes(cls, lines):
+        ''' A table of the games on `lines` read in binary mode,
+            parsed straight into the table's columns.
+        '''
+        table = cls()
+        for line in lines:
+            if line.strip():
+                table.append(*parse_game_bytes(line))
+        return table
+
+    @classmethod
+    def from_file(cls, path):
+        ''' A table of the games in the file at `path`,
+            read through a memory map where the file allows it.
+        '''
+        with open(path, 'rb') as file:
+            try:
+                with mmap.mmap(file.fileno(), 0,
+                               access=mmap.ACCESS_READ) as data:
+                    return cls.from_bytes(iter(data.readline, b''))
+            except (ValueError, OSError):
+                # Empty files and pipes cannot be mapped
+                return cls.from_bytes(file)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def minimal_cube_sets(self) -> tuple[array, array, array]:
+        ''' `minimal_cube_set` of every game, as red, green and blue columns.
+        '''
+        columns = tuple(array('I', bytes(4 * len(self))) for _ in colors)
+        counts, offsets = self.counts, self.offsets
+        for k in range(len(self)):
+            rounds = counts[3 * offsets[k] : 3 * offsets[k + 1]]
+            for c, column in enumerate(columns):
+                column[k] = max(rounds[c::3], default=0)
+        return columns
+
+    def game_is_possible(self, bag: CubeSet) -> list[bool]:
+        ''' `game_is_possible` for every game.
+        '''
+        reds, greens, blues = self.minimal_cube_sets()
+        return [r <= bag['red'] and g <= bag['green'] and b <= bag['blue']
+                for r, g, b in zip(reds, greens, blues)]
+
+    def powers(self) -> list[int]:
+        ''' `power` of the minimal cube set of every game.
+        '''
+        reds, greens, blues = self.minimal_cube_sets()
+        return [r * g * b for r, g, b in zip(reds, greens, blues)]
+
+
+class BagIndex:
+    ''' Answers "which games fit this bag?" for many bags.
+        For each colour, the games are kept in order of how many cubes
+        of that colour they need, so the games that need no more
+        than a bag holds are a prefix of that order, found by bisection.
+        Only the games in the shortest of a bag's three prefixes
+        are then checked against the other two colours.
+    '''
+
+    def __init__(self, table: GameTable):
+        self.ids = table.ids
+        self.columns = table.minimal_cube_sets()
+        self.orders = []  # Game positions, by the count of each colour
+        self.counts = []  # Those counts, in the same order
+        for column in self.columns:
+            order = sorted(range(len(column)), key=column.__getitem__)
+            self.orders.append(array('I', order))
+            self.counts.append(array(column.typecode,
+                                     (column[k] for k in order)))
+
+    def fitting(self, bag: CubeSet) -> list[int]:
+        ''' The positions of the games that fit `bag`, in table order.
+        '''
+        limits = [bag[color] for color in colors]
+        ends = [bisect_right(counts, limit)
+                for counts, limit in zip(self.counts, limits)]
+        c = min(range(len(colors)), key=ends.__getitem__)
+        (red, green, blue), (r, g, b) = self.columns, limits
+        return sorted(k for k in self.orders[c][:ends[c]]
+                      if red[k] <= r and green[k] <= g and blue[k] <= b)
+
+    def query(self, bags) -> list[tuple[list[int], int]]:
+        ''' For each bag, the IDs of the games that fit it and their sum.
+        '''
+        answers = []
+        for bag in bags:
+            ids = [self.ids[k] for k in self.fitting(bag)]
+            answers.append((ids, sum(ids)))
+        return answers
+
+
+def generate(size: int, seed: int = 0):
+    ''' `size` made-up game records, one line at a time.
+        The same seed always gives the same games.
+    '''
+    rng = random.Random(seed)
+    for game_id in range(1, size + 1):
+        rounds = []
+        for _ in range(rng.randint(1, 6)):
+            shown = rng.sample(colors, rng.randint(1, 3))
+            rounds.append(', '.join(f'{rng.randint(1, 20)} {color}'
+                                    for color in shown))
+        rounds = '; '.join(rounds)
+        yield f'Game {game_id}: {rounds}\n'
+
+
+def benchmark_parse(count: int = 100_000) -> dict:
+    ''' Seconds taken to parse `count` generated games
+        with the regex into dicts, and from bytes into a `GameTable`.
+    '''
+    lines = list(generate(count))
+    blines = [line.encode() for line in lines]
+    timings = {}
+    started = time.perf_counter()
+    GameTable(parse(lines))
+    timings['regex'] = time.perf_counter() - started
+    started = time.perf_counter()
+    GameTable.from_bytes(blines)
+    timings['bytes'] = time.perf_counter() - started
+    return timings
+
+
 test_input = (
     'Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green',
     'Game 2: 1 blue, 2 green; 3 green, 4 blue, 1 red; 1 green, 1 blue',
@@ -86,11 +289,70 @@ def test1():
     # The IDs of these games sum to 8.
     assert sum(which_games) == 8
 
+    table = GameTable(parse(test_input))
+    bag = {'red': 12, 'green': 13, 'blue': 14}
+    assert tuple(game_id for game_id, possible
+                 in zip(table.ids, table.game_is_possible(bag))
+                 if possible) == which_games
+
+    from_bytes = GameTable.from_bytes(line.encode() for line in test_input)
+    for column in ('ids', 'offsets', 'counts'):
+        assert getattr(from_bytes, column) == getattr(table, column)
+    # Counts too large for the table are turned down, and the table is kept
+    try:
+        from_bytes.append(*parse_game_bytes(b'Game 7: 1 red; 5000000000 red'))
+    except OverflowError as error:
+        assert 'Game 7' in str(error)
+    else:
+        raise AssertionError('5000000000 red fitted in 32 bits')
+    assert from_bytes.counts == table.counts
+    assert len(from_bytes) == len(table)
+    # Anything else is left to parse_game, which turns these down
+    for line in (b'Game 7: 2 red ;1 blue', b'Game 1: -3 red',
+                 b'Game +1: 3 red', b'Game 1: 3 red,1 blue'):
+        try:
+            parse_game_bytes(line)
+        except AssertionError:
+            continue
+        raise AssertionError(f'{line} was not handed to parse_game')
+
+    index = BagIndex(table)
+    bags = [bag, {'red': 0, 'green': 0, 'blue': 0},
+            {'red': 20, 'green': 13, 'blue': 15},
+            {'red': 14, 'green': 3, 'blue': 15}]
+    (ids, total), *_ = index.query(bags)
+    assert tuple(ids) == which_games and total == 8
+    for bag, (ids, total) in zip(bags, index.query(bags)):
+        assert ids == [game_id for game_id, game
+                       in enumerate(parse(test_input), start=1)
+                       if game_is_possible(game, bag)]
+
+    # The index grows with the number of games,
+    # however large their counts and however many different ones there are.
+    games = list(parse(['Game 1: 5000000 red, 1 blue', 'Game 2: 3 green']))
+    index = BagIndex(GameTable(games))
+    big = {'red': 5000000, 'green': 3, 'blue': 1}
+    assert index.query([big, big | {'red': 4999999}, big | {'red': -1}]) \
+        == [([1, 2], 3), ([2], 2), ([], 0)]
+    games = [[{'red': k, 'green': 3000 - k, 'blue': k % 7}]
+             for k in range(3000)]
+    index = BagIndex(GameTable(games))
+    assert all(len(counts) == len(games) for counts in index.counts)
+    bags = [{'red': 1500, 'green': 1500, 'blue': 6},
+            {'red': 2000, 'green': 1200, 'blue': 3},
+            {'red': 2999, 'green': 2999, 'blue': 0}]
+    for bag, (ids, total) in zip(bags, index.query(bags)):
+        assert ids == [game_id for game_id, game
+                       in enumerate(games, start=1)
+                       if game_is_possible(game, bag)] and total == sum(ids)
+
 
 def part1() -> int:
-    with open('day-2/input.txt') as file:
-        which_games = tuple(possible_game_ids(file))
-    return sum(which_games)
+    table = GameTable.from_file('day-2/input.txt')
+    bag = {'red': 12, 'green': 13, 'blue': 14}
+    return sum(game_id for game_id, possible
+               in zip(table.ids, table.game_is_possible(bag))
+               if possible)
 
 
 def minimal_cube_set(game: Game) -> CubeSet:
@@ -142,11 +404,29 @@ def test2():
     assert sum(power(minimal_cube_set(game))
                for game in parse(test_input)) == 2286
 
+    table = GameTable(games)
+    assert [dict(zip(colors, rgb))
+            for rgb in zip(*table.minimal_cube_sets())] \
+        == list(test_minimal_cube_sets)
+    assert table.powers() == list(test_powers)
+
 
 def part2() -> int:
-    with open('day-2/input.txt') as file:
-        games = tuple(parse(file))
-    return sum(power(minimal_cube_set(game)) for game in games)
+    table = GameTable.from_file('day-2/input.txt')
+    return sum(table.powers())
+
+
+def load(path) -> GameTable:
+    return GameTable.from_file(path)
+
+
+def solve(table: GameTable, part: int) -> int:
+    if part == 1:
+        bag = {'red': 12, 'green': 13, 'blue': 14}
+        return sum(game_id for game_id, possible
+                   in zip(table.ids, table.game_is_possible(bag))
+                   if possible)
+    return sum(table.powers())
 
 
 if __name__ == '__main__':
@@ -1,7 +1,12 @@
 #!python
 ''' Day 3
 '''
+import mmap
+import random
 import re
+import time
+from array import array
+from collections import deque
 from functools import reduce
 
 test_input = '''\
@@ -18,15 +23,15 @@ test_input = '''\
 '''
 
 
-def get_number_spans(engine_schematic):
-    for i, row in enumerate(engine_schematic):
+def get_number_spans(engine_schematic, start=0):
+    for i, row in enumerate(engine_schematic, start):
         matches = re.finditer(r'(\d+)', row)
         for match in matches:
             yield int(match.group(0)), i, match.span()
 
 
-def get_symbol_spans(engine_schematic):    
-    for i, row in enumerate(engine_schematic):
+def get_symbol_spans(engine_schematic, start=0):    
+    for i, row in enumerate(engine_schematic, start):
         matches = re.finditer(r'([^\d.])', row)
         for match in matches:
             yield (match.group(0), i, match.span())
@@ -52,6 +57,29 @@ def neighbours(this, those):
             yield that
 
 
+def indexed_neighbours(those):
+    ''' Like `neighbours`, but with `those` indexed once, cell by cell,
+        so that each query only looks at the cells around `this`
+        instead of at every span.
+    '''
+    those = list(those)
+    grid = {}
+    for n, (that_string, k, (l0, l1)) in enumerate(those):
+        for l in range(l0, l1):
+            grid[k, l] = n
+
+    def neighbours_of(this):
+        this_string, i, (j0, j1) = this
+        found = {grid[k, l]
+                 for k in range(i - 1, i + 2)
+                 for l in range(j0 - 1, j1 + 1)
+                 if (k, l) in grid}
+        for n in sorted(found):
+            yield those[n]
+
+    return neighbours_of
+
+
 def get_part_numbers(engine_schematic):
     ''' In the engine schematic,
         a number adjacent to a symbol (even diagonally) is a "part number".
@@ -65,9 +93,10 @@ def get_part_numbers(engine_schematic):
 
     number_spans = [*get_number_spans(engine_schematic)]
     symbol_spans = [*get_symbol_spans(engine_schematic)]
+    symbol_neighbours = indexed_neighbours(symbol_spans)
 
     for number_span in number_spans:
-        if tuple(neighbours(number_span, symbol_spans)):
+        if tuple(symbol_neighbours(number_span)):
             number, i, span = number_span
             yield number
 
@@ -79,6 +108,15 @@ def test1():
         == sorted([467, 35, 633, 617, 592, 755, 664, 598])
     assert sum(part_numbers) == 4361
 
+    # The index finds the same neighbours as comparing every pair of spans.
+    number_spans = [*get_number_spans(engine_schematic)]
+    symbol_spans = [*get_symbol_spans(engine_schematic)]
+    for these, those in ((number_spans, symbol_spans),
+                         (symbol_spans, number_spans)):
+        neighbours_of = indexed_neighbours(those)
+        for this in these:
+            assert list(neighbours_of(this)) == list(neighbours(this, those))
+
 
 def part1():
     with open('day-3/input.txt') as file:
@@ -95,10 +133,11 @@ def get_gear_ratios(engine_schematic):
 
     number_spans = [*get_number_spans(engine_schematic)]
     symbol_spans = [*get_symbol_spans(engine_schematic)]
+    number_neighbours = indexed_neighbours(number_spans)
 
     for symbol_span in symbol_spans:
         if symbol_span[0] == '*':
-            nb = list(neighbours(symbol_span, number_spans))
+            nb = list(number_neighbours(symbol_span))
             if len(nb) == 2:
                 yield reduce(lambda x, y: x * y,
                              (x[0] for x in nb), 1)
@@ -118,10 +157,200 @@ def part2():
     return sum(gear_ratios)
 
 
+def row_neighbourhoods(lines):
+    ''' Read the schematic one line at a time,
+        keeping the spans of no more than three rows.
+        As soon as a row's neighbours are known
+        (that is, once the row below it has been read),
+        yield that row's (number spans, symbol spans)
+        along with the number spans and symbol spans
+        of the rows above, at and below it.
+    '''
+    window = deque(maxlen=3)
+
+    def neighbourhood(centre):
+        return (centre,
+                [span for numbers, symbols in window for span in numbers],
+                [span for numbers, symbols in window for span in symbols])
+
+    rows = (line.strip() for line in lines)
+    for i, row in enumerate(row for row in rows if row):
+        window.append(([*get_number_spans([row], i)],
+                       [*get_symbol_spans([row], i)]))
+        if len(window) >= 2:
+            yield neighbourhood(window[-2])
+    if window:
+        if len(window) == 3:
+            window.popleft()
+        yield neighbourhood(window[-1])
+
+
+def stream_part_numbers(lines):
+    ''' `get_part_numbers` in constant memory,
+        for schematics that are read a line at a time.
+    '''
+    for (numbers, symbols), _, nearby_symbols in row_neighbourhoods(lines):
+        symbol_neighbours = indexed_neighbours(nearby_symbols)
+        for number_span in numbers:
+            if tuple(symbol_neighbours(number_span)):
+                number, i, span = number_span
+                yield number
+
+
+def stream_gear_ratios(lines):
+    ''' `get_gear_ratios` in constant memory,
+        for schematics that are read a line at a time.
+        The numbers of a gear may be on the rows above and below it.
+    '''
+    for (numbers, symbols), nearby_numbers, _ in row_neighbourhoods(lines):
+        number_neighbours = indexed_neighbours(nearby_numbers)
+        for symbol_span in symbols:
+            if symbol_span[0] == '*':
+                nb = list(number_neighbours(symbol_span))
+                if len(nb) == 2:
+                    yield reduce(lambda x, y: x * y,
+                                 (x[0] for x in nb), 1)
+
+
+# Cell classes, one byte per cell: 1 for a symbol, 0 for a digit or '.'
+symbol_table = bytes(0 if chr(b) in '0123456789.' else 1 for b in range(256))
+
+
+def read_schematic(path) -> list[bytes]:
+    ''' The rows of the engine schematic at `path`, as bytes,
+        read through a memory map where the file allows it.
+    '''
+    with open(path, 'rb') as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                rows = [row.strip() for row in iter(data.readline, b'')]
+        except (ValueError, OSError):
+            # Empty files and pipes cannot be mapped
+            rows = [row.strip() for row in file]
+    return [row for row in rows if row]
+
+
+def scan_grid(engine_schematic):
+    ''' Part numbers and gear ratios,
+        worked out on the grid of cells rather than span by span.
+        Each row is turned into one int with a byte per cell,
+        1 where there is a symbol;
+        shifting and or-ing these ints smears every symbol
+        over its 3x3 neighbourhood, all cells at once.
+        A number is a part number if any of its cells is touched.
+        For gears, each cell is labelled with the number covering it.
+    '''
+    rows = [row.encode() if isinstance(row, str) else row
+            for row in engine_schematic]
+    rows = [row.strip() for row in rows if row.strip()]
+    if not rows:
+        return [], []
+    height, width = len(rows), len(rows[0])
+    full = (1 << 8 * width) - 1
+
+    # Dilated symbol mask
+    symbols = [int.from_bytes(row.translate(symbol_table), 'little')
+               for row in rows]
+    smeared = [(m | m << 8 | m >> 8) & full for m in symbols]
+    touched = [(smeared[i]
+                | (smeared[i - 1] if i > 0          else 0)
+                | (smeared[i + 1] if i < height - 1 else 0)
+                ).to_bytes(width, 'little')
+               for i in range(height)]
+
+    # Digit-run labels
+    numbers = []
+    labels = array('l', [-1]) * (height * width)
+    part_numbers = []
+    for i, row in enumerate(rows):
+        for match in re.finditer(rb'\d+', row):
+            j0, j1 = match.span()
+            label = len(numbers)
+            numbers.append(int(match.group(0)))
+            labels[i * width + j0 : i * width + j1] \
+                = array('l', [label]) * (j1 - j0)
+            if 1 in touched[i][j0:j1]:
+                part_numbers.append(numbers[label])
+
+    gear_ratios = []
+    for i, row in enumerate(rows):
+        j = row.find(b'*')
+        while j != -1:
+            nb = {labels[k * width + l]
+                  for k in range(max(i - 1, 0), min(i + 2, height))
+                  for l in range(max(j - 1, 0), min(j + 2, width))}
+            nb.discard(-1)
+            if len(nb) == 2:
+                x, y = nb
+                gear_ratios.append(numbers[x] * numbers[y])
+            j = row.find(b'*', j + 1)
+
+    return part_numbers, gear_ratios
+
+
+def generate(size: int, seed: int = 0, columns=None):
+    ''' A made-up engine schematic of `size` rows, one line at a time.
+        It is square unless a number of `columns` is given.
+        The same seed always gives the same schematic.
+    '''
+    rng = random.Random(seed)
+    cells = '.' * 12 + '0123456789' + '*#+$'
+    for _ in range(size):
+        yield ''.join(rng.choices(cells, k=columns or size)) + '\n'
+
+
+def benchmark_grid(rows: int = 1000, columns: int = 1000) -> dict:
+    ''' Seconds taken by the span-based and grid-based solvers
+        on a generated schematic.
+    '''
+    engine_schematic = list(generate(rows, columns=columns))
+    timings = {}
+    started = time.perf_counter()
+    spans = ([*get_part_numbers(engine_schematic)],
+             [*get_gear_ratios (engine_schematic)])
+    timings['spans'] = time.perf_counter() - started
+    started = time.perf_counter()
+    grid = scan_grid(engine_schematic)
+    timings['grid'] = time.perf_counter() - started
+    assert spans == grid
+    return timings
+
+
+def test3():
+    engine_schematic = test_input.split('\n')
+    part_numbers, gear_ratios = scan_grid(engine_schematic)
+    assert part_numbers == [*get_part_numbers(engine_schematic)]
+    assert gear_ratios  == [*get_gear_ratios (engine_schematic)]
+    assert part_numbers == [*stream_part_numbers(iter(engine_schematic))]
+    assert gear_ratios  == [*stream_gear_ratios (iter(engine_schematic))]
+    assert [*stream_part_numbers(engine_schematic[:1])] == []
+    assert scan_grid([]) == scan_grid(['', '\n']) == ([], [])
+
+    engine_schematic = read_schematic('day-3/input.txt')
+    lines = [row.decode() for row in engine_schematic]
+    part_numbers, gear_ratios = scan_grid(engine_schematic)
+    assert part_numbers == [*get_part_numbers(lines)]
+    assert gear_ratios  == [*get_gear_ratios (lines)]
+    with open('day-3/input.txt') as file:
+        assert part_numbers == [*stream_part_numbers(file)]
+    with open('day-3/input.txt') as file:
+        assert gear_ratios  == [*stream_gear_ratios (file)]
+
+
+def load(path) -> list[bytes]:
+    return read_schematic(path)
+
+
+def solve(engine_schematic, part: int) -> int:
+    part_numbers, gear_ratios = scan_grid(engine_schematic)
+    return sum(part_numbers if part == 1 else gear_ratios)
+
+
 if __name__ == '__main__':
     print(test_input)
     test1()
     print(f'Part 1: {part1()}')
     test2()
     print(f'Part 2: {part2()}')
+    test3()
 
@@ -2,6 +2,10 @@
 ''' Day 4: Scratchcards
 '''
 import re
+import random
+import time
+from collections import deque
+from array import array
 
 test_input = '''\
 Card 1: 41 48 83 86 17 | 83 86  6 31 17  9 48 53
@@ -15,23 +19,101 @@ Card 6: 31 18 13 56 72 | 74 77 10 23 35 67 36 11\
 Card = tuple[int, list[int], list[int]]
 
 
-def parse_cards(lines: str):
+subpattern = r'\d+(?: +\d+)*'
+card_pattern = re.compile(rf'Card +(\d+): +({subpattern}) \|'
+                                       f' +({subpattern})')
+
+
+def parse_card(line: str) -> Card:
+    match = card_pattern.match(line)
+    assert match is not None, line
+    card_number, winning_numbers, your_numbers = match.groups()
+    card_number = int(card_number)
+    winning_numbers = [int(s) for s in winning_numbers.split(' ') if s]
+    your_numbers    = [int(s) for s in your_numbers   .split(' ') if s]
+    return card_number, winning_numbers, your_numbers
+
+
+def parse_card_bytes(line: bytes) -> Card:
+    ''' A faster `parse_card` for lines read in binary mode.
+        The standard `Card N: ... | ...` layout is split without a regex;
+        anything else is decoded and handed to `parse_card`,
+        to be read the way the regex reads it, or turned down.
+    '''
+    head, colon, numbers = line.strip().partition(b': ')
+    winning_numbers, bar, your_numbers = numbers.partition(b' | ')
+    if colon and bar and head.startswith(b'Card ') \
+       and not winning_numbers.endswith(b' '):
+        card_number = head[5:].lstrip(b' ')
+        xs = [s for s in winning_numbers.split(b' ') if s]
+        ys = [s for s in your_numbers   .split(b' ') if s]
+        if xs and ys and card_number.isdigit() \
+           and all(s.isdigit() for s in xs) \
+           and all(s.isdigit() for s in ys):
+            return int(card_number), [*map(int, xs)], [*map(int, ys)]
+    return parse_card(line.decode().strip())
+
+
+def parse_cards(lines):
     ''' Each card has two lists of numbers, separated by a vertical bar:
         a list of winning numbers
         and a list of your numbers. 
+
+        `lines` may be one string, or any iterable of lines
+        (a file opened in text or binary mode, say).
+        Cards are yielded one at a time, as their lines are read.
     '''
-    lines = [line.strip() for line in lines.split('\n')]
-    subpattern = r'\d+(?: +\d+)*'
-    pattern = re.compile(rf'Card +(\d+): +({subpattern}) \|'
-                                      f' +({subpattern})')
+    if isinstance(lines, (str, bytes)):
+        lines = lines.splitlines()
     for line in lines:
-        match = pattern.match(line)
-        assert match is not None, line
-        card_number, winning_numbers, your_numbers = match.groups()
-        card_number = int(card_number)
-        winning_numbers = [int(s) for s in winning_numbers.split(' ') if s]
-        your_numbers    = [int(s) for s in your_numbers   .split(' ') if s]
-        yield card_number, winning_numbers, your_numbers
+        if not line.strip():
+            continue
+        if isinstance(line, bytes):
+            yield parse_card_bytes(line)
+        else:
+            yield parse_card(line.strip())
+
+
+def generate(size: int, seed: int = 0):
+    ''' A pile of `size` made-up cards, one line at a time,
+        each with 10 winning numbers and 25 of your numbers.
+        Cards with many matches are rare (each match is a third as likely
+        as one fewer), so that the number of instances stays reasonable
+        however big the pile is;
+        and no card wins copies of cards past the end of the pile.
+        The same seed always gives the same pile.
+    '''
+    rng = random.Random(seed)
+    numbers = range(1, 100)
+    width = len(str(size))
+    weights = [3 ** -m for m in range(11)]
+    for i in range(1, size + 1):
+        winning = rng.sample(numbers, 10)
+        losing = [n for n in numbers if n not in winning]
+        m = min(rng.choices(range(11), weights)[0], size - i)
+        yours = rng.sample(winning, m) + rng.sample(losing, 25 - m)
+        rng.shuffle(yours)
+        yield (f'Card {i:>{width}}: '
+               + ' '.join(f'{n:>2}' for n in winning)
+               + ' | '
+               + ' '.join(f'{n:>2}' for n in yours)
+               + '\n')
+
+
+def benchmark_parse_cards(count: int = 100_000, seed: int = 0) -> dict:
+    ''' Seconds taken to parse `count` generated cards
+        with the regex, and with the binary fast path.
+    '''
+    lines = list(generate(count, seed))
+    blines = [line.encode() for line in lines]
+    timings = {}
+    for name, parse, data in (('regex', parse_card,       lines),
+                              ('bytes', parse_card_bytes, blines)):
+        started = time.perf_counter()
+        for line in data:
+            parse(line)
+        timings[name] = time.perf_counter() - started
+    return timings
 
 
 def points(matches: int) -> int:
@@ -52,10 +134,9 @@ def get_matches(lines: str):
 def part1():
     ''' How many points are the cards worth in total?
     '''
-    with open('day-4/input.txt') as file:
-        lines = ''.join(line for line in file if line)
-    matcheses = get_matches(lines)
-    return sum(points(len(matches)) for matches in matcheses)
+    with open('day-4/input.txt', 'rb') as file:
+        store = CardStore(parse_cards(file))
+    return sum(map(points, store.match_counts()))
 
 
 def test1():
@@ -82,33 +163,141 @@ def test1():
     # The pile of scratchcards is worth 13 points.
     assert sum(points(len(matches)) for matches in matcheses) == 13
 
+    store = CardStore(parse_cards(test_input))
+    assert store.match_counts() == [len(matches) for matches in matcheses]
+
+    # Lines read in binary mode parse the same way.
+    cards = list(parse_cards(test_input))
+    assert list(parse_cards(test_input.encode())) == cards
+    assert list(parse_cards(test_input.encode().split(b'\n'))) == cards
+    assert parse_card_bytes(b'Card  7:  1  2 | 3\n') == (7, [1, 2], [3])
+    # Anything else is left to parse_card, which reads it as the regex does
+    assert parse_card_bytes(b'Card 1: 1 2 | 3 -4') == (1, [1, 2], [3])
+    for line in (b'Card 1: | ', b'Card 1:1 2|3 4', b'Card -1: 1 | 2',
+                 b'Card 1: 1 2  | 3', b'Card 1: 1\t2 | 3'):
+        try:
+            parse_card_bytes(line)
+        except AssertionError:
+            continue
+        raise AssertionError(f'{line} was not handed to parse_card')
+
+
+# Bits in a card mask: numbers 0 to 127 (real cards use 1 to 99)
+width = 128
+
+
+def bitmask(numbers) -> int:
+    ''' The set of `numbers` as an int, with bit n set for each number n.
+        The numbers should be between 0 and `width` - 1.
+    '''
+    mask = 0
+    for n in numbers:
+        mask |= 1 << n
+    return mask
+
 
 def summarize(card: Card) -> tuple[int, int]:
     i, xs, ys = card
+    xs = set(xs)
     m = len([y for y in ys if y in xs])
     return i, m
 
 
+class CardStore:
+    ''' A pile of cards, each kept as its card number
+        and two `width`-bit masks: its winning numbers and your numbers.
+        A card that masks cannot count as `summarize` does
+        (with a number outside the masks, or a number of yours repeated)
+        gets empty masks, and its match count is kept as it is instead.
+    '''
+
+    def __init__(self, cards=()):
+        self.numbers = array('Q')
+        self.winning = []
+        self.yours   = []
+        self.counted = {}  # Match counts of the cards without masks
+        for i, xs, ys in cards:
+            self.numbers.append(i)
+            if all(0 <= n < width for n in xs) \
+               and all(0 <= n < width for n in ys):
+                winning, yours = bitmask(xs), bitmask(ys)
+                if yours.bit_count() == len(ys):
+                    self.winning.append(winning)
+                    self.yours  .append(yours)
+                    continue
+            self.counted[len(self.winning)] = summarize((i, xs, ys))[1]
+            self.winning.append(0)
+            self.yours  .append(0)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def match_counts(self) -> list[int]:
+        ''' How many of your numbers are winning numbers, card by card?
+        '''
+        counts = [(xs & ys).bit_count()
+                  for xs, ys in zip(self.winning, self.yours)]
+        for k, m in self.counted.items():
+            counts[k] = m
+        return counts
+
+    def summary(self):
+        ''' Card numbers with their match counts, as `summarize` gives.
+        '''
+        return zip(self.numbers, self.match_counts())
+
+
 def process_scratchcards(originals: list[Card]):
+    return count_instances(map(summarize, originals))
+
 
-    summary = list(map(summarize, originals))
-    # Record card number and score
-    scores = {i: m for i, m in summary}
-    # Record card number and count
-    processable = {i: 1 for i, m in summary}
-    processed   = {i: 0 for i, m in summary}
-
-    while any(n != 0 for n in processable.values()):
-        i = next(i for i, n in processable.items() if n > 0)
-        processed  [i] += (n := processable[i])
-        processable[i]  = 0
-        for j in range(i + 1, i + scores[i] + 1):
-            processable[j] += n
-
-    assert all(n == 0 for n in processable.values())
+def count_instances(summary):
+    ''' How many instances of each card do we end up with,
+        given each card's number and match count?
+        Cards are numbered consecutively,
+        and a card only ever wins copies of the cards below it,
+        so one pass from top to bottom settles every count.
+        The copies won by card i are recorded as a difference:
+        +n where the run of won cards starts and -n just past its end.
+    '''
+    summary = list(summary)
+    size = len(summary)
+    # A list rather than an array('Q'): counts can outgrow 64 bits.
+    delta = [0] * (size + 1)
+    processed = {}
+    copies = 0
+    for k, (i, m) in enumerate(summary):
+        copies += delta[k]
+        # The original plus every copy won so far
+        processed[i] = n = 1 + copies
+        delta[min(k + 1,     size)] += n
+        delta[min(k + 1 + m, size)] -= n
     return processed
 
 
+def stream_instances(cards):
+    ''' Like `process_scratchcards`, but for a feed of cards
+        that may never end.
+        Each card's final number of instances is known
+        as soon as the card itself arrives, so it is yielded right away
+        as (card_number, instances).
+        Only the copies won for the next few cards are remembered,
+        as differences, one per card up to the largest match count so far.
+    '''
+    delta = deque()  # delta[j]: change in copies, j cards from now
+    copies = 0
+    for card in cards:
+        i, m = summarize(card)
+        if delta:
+            copies += delta.popleft()
+        n = 1 + copies
+        while len(delta) <= m:
+            delta.append(0)
+        delta[0] += n
+        delta[m] -= n
+        yield i, n
+
+
 def test2():
     originals = list(parse_cards(test_input))
     processed = process_scratchcards(originals)
@@ -122,19 +311,40 @@ def test2():
     #  1 instance  of card 6.
     assert sum(processed.values()) == 30
     assert processed == {1: 1, 2: 2, 3: 4, 4: 8, 5: 14, 6: 1}
+    store = CardStore(originals)
+    assert count_instances(store.summary()) == processed
+    assert dict(stream_instances(iter(originals))) == processed
+    # A number you have twice matches twice
+    assert summarize((1, [5], [5, 5])) == (1, 2)
+    # ... as it does in the store, which also takes any numbers at all
+    cards = [(1, [5], [5, 5]), (2, [10 ** 9, 7], [10 ** 9, 3, 7]),
+             (3, [-4, 1], [-4]), (4, [5, 6], [6, 99])]
+    store = CardStore(cards)
+    assert store.match_counts() == [m for i, m in map(summarize, cards)]
+    assert store.winning[1] == 0 and len(store.counted) == 3
 
 
 def part2():
     ''' Process the pile of scratchcards.
         How many scratchcards do you end up with?
     '''
-    with open('day-4/input.txt') as file:
-        lines = ''.join(line for line in file if line)
-    originals = list(parse_cards(lines))
-    processed = process_scratchcards(originals)
+    with open('day-4/input.txt', 'rb') as file:
+        store = CardStore(parse_cards(file))
+    processed = count_instances(store.summary())
     return sum(processed.values())
 
 
+def load(path) -> CardStore:
+    with open(path, 'rb') as file:
+        return CardStore(parse_cards(file))
+
+
+def solve(store: CardStore, part: int) -> int:
+    if part == 1:
+        return sum(map(points, store.match_counts()))
+    return sum(count_instances(store.summary()).values())
+
+
 if __name__ == '__main__':
     parse_cards(test_input)
     test1()
@@ -1,7 +1,14 @@
 #!python3
 ''' Day 5
 '''
+import random
 import re
+import sys
+import time
+from multiprocessing import Pool
+from array import array
+from bisect import bisect_right
+from math import inf
 
 # The almanac lists:
 # - What kind of seeds to plant 
@@ -49,58 +56,125 @@ humidity-to-location map:
 56 93 4\
 '''
 
-def make_seed2location(information: dict, seed_number: int) -> int:
+categories = ('seed', 'soil', 'fertilizer', 'water',
+              'light', 'temperature', 'humidity', 'location')
+
+
+def chain(information: dict):
+    ''' The sections in the order a seed passes through them.
+    '''
     sections = information['sections']
-    seed2soil            = mapping_from_triples(sections['seed', 'soil'])
-    soil2fertilizer      = mapping_from_triples(sections['soil', 'fertilizer'])
-    fertilizer2water     = mapping_from_triples(sections['fertilizer', 'water'])
-    water2light          = mapping_from_triples(sections['water', 'light'])
-    light2temperature    = mapping_from_triples(sections['light', 'temperature'])
-    temperature2humidity = mapping_from_triples(sections['temperature', 'humidity'])
-    humidity2location    = mapping_from_triples(sections['humidity', 'location'])
-    return humidity2location(
-            temperature2humidity(
-             light2temperature(
-              water2light(
-               fertilizer2water(
-                soil2fertilizer(
-                 seed2soil(seed_number)))))))
-
-
-def parse_almanac(almanac: str):
-    information = {'seeds': [], 'sections': {}}
-    lines = [line.strip() for line in almanac.split('\n')]
+    for src, dest in zip(categories, categories[1:]):
+        yield sections[src, dest]
+
+
+def fingerprint(information: dict) -> tuple:
+    ''' Enough to tell whether an almanac's sections have changed:
+        which sections there are, and how many ranges each one has.
+    '''
+    return tuple((key, id(section), len(section))
+                 for key, section in information['sections'].items())
+
+
+def compiled_almanac(information: dict):
+    ''' `compile_almanac(information)`, compiled on first use
+        and kept in the almanac itself, under 'compiled'.
+        It is compiled again if sections are added, replaced or extended.
+    '''
+    key = fingerprint(information)
+    cached = information.get('compiled')
+    if cached is None or cached[0] != key:
+        cached = information['compiled'] = key, compile_almanac(information)
+    return cached[1]
+
+
+def seed2location_pipeline(information: dict):
+    ''' The seed-to-location map for this almanac.
+    '''
+    seed2location, starts, offsets = compiled_almanac(information)
+    return seed2location
+
+
+def make_seed2location(information: dict, seed_number: int) -> int:
+    return seed2location_pipeline(information)(seed_number)
+
+
+class Section:
+    ''' The ranges of one map, held as three parallel arrays
+        rather than as a list of tuples.
+        Iterating over a section yields (dest0, src0, length) triples.
+    '''
+
+    def __init__(self, triples=()):
+        self.dests   = array('Q')
+        self.srcs    = array('Q')
+        self.lengths = array('Q')
+        for triple in triples:
+            self.append(triple)
+
+    def append(self, triple):
+        dest0, src0, length = triple
+        self.dests  .append(dest0)
+        self.srcs   .append(src0)
+        self.lengths.append(length)
+
+    def __len__(self):
+        return len(self.srcs)
+
+    def __iter__(self):
+        return zip(self.dests, self.srcs, self.lengths)
+
+    def __repr__(self):
+        return f'Section({list(self)})'
+
+
+# Patterns
+seed_pattern  = re.compile(r'seeds: +(\d+(?: +\d+)*)')
+title_pattern = re.compile(r'(.*)-to-(.*) map:')
+range_pattern = re.compile(r'(\d+) +(\d+) +(\d+)')
+
+
+def parse_almanac(almanac):
+    ''' `almanac` may be a whole almanac as a string,
+        or any iterable of its lines (such as an open file),
+        which is read one line at a time.
+    '''
+    if isinstance(almanac, str):
+        almanac = almanac.split('\n')
+    lines = map(str.strip, almanac)
+    information = {'seeds': array('Q'), 'sections': {}}
     # The almanac starts by listing which seeds need to be planted
-    seedline = lines.pop(0)
-    match = re.match(r'seeds: +(\d+(?: +\d+)*)', seedline)
+    seedline = next(lines)
+    match = seed_pattern.match(seedline)
     assert match is not None
-    information['seeds'] = [int(s) for s in match.group(1).split(' ') if s]
+    information['seeds'].extend(int(s) for s in match.group(1).split(' ') if s)
     # The rest of the almanac describes a collection of mappings 
     # between two categories of numbers.
     # The "seed-to-soil map" section describes how to convert a seed number (the source) to a soil number (the destination). 
     # This says which soil to use with which seeds, 
     # which water to use with which fertilizer, and so on.
+    section = None
     for line in lines:
 
-        # Section title? 
-        title_match = re.match('(.*)-to-(.*) map:', line)
-        if title_match is not None:
-            src, dest = title_match.groups()
-            information['sections'][src, dest] = []
-
         # Range description?
-        range_match = re.match(r'(\d+) +(\d+) +(\d+)', line)
+        range_match = range_pattern.match(line)
         if range_match is not None:
             # Each mapping is described in terms of a range of numbers. 
             # Each line contains three numbers:
             # - The destination range start 
             # - The source range start
             # - The range length
-            dest0, src0, length = map(int, range_match.groups())
-            information['sections'][src, dest].append((dest0, src0, length))
+            section.append(map(int, range_match.groups()))
+            continue
+
+        # Section title? 
+        title_match = title_pattern.match(line)
+        if title_match is not None:
+            src, dest = title_match.groups()
+            section = information['sections'][src, dest] = Section()
 
         if not line:
-            src, dest = '', ''
+            section = None
 
     return information
 
@@ -118,6 +192,193 @@ def mapping_from_triples(triples):
     return mapping
 
 
+Interval = tuple[int, int]  # Half-open: [start, stop)
+
+
+def map_intervals(intervals, triples) -> list[Interval]:
+    ''' Send a set of half-open intervals through one section at once.
+        Each interval is split at the edges of every source range it touches;
+        the overlapping pieces are shifted to their destinations
+        and whatever is left over passes through unchanged.
+    '''
+    pending = [(lo, hi) for lo, hi in intervals if lo < hi]
+    mapped  = []
+    for a, b, c in triples:
+        # src  = range(b, b + c))
+        # dest = range(a, a + c))
+        leftover = []
+        for lo, hi in pending:
+            if lo < b:
+                leftover.append((lo, min(hi, b)))
+            if hi > b + c:
+                leftover.append((max(lo, b + c), hi))
+            if (start := max(lo, b)) < (stop := min(hi, b + c)):
+                mapped.append((start + a - b, stop + a - b))
+        pending = leftover
+    return mapped + pending
+
+
+def seed_ranges(information: dict) -> list[Interval]:
+    ''' The values on the initial seeds: line come in pairs.
+        Within each pair, the first value is the start of the range
+        and the second value is the length of the range.
+    '''
+    seeds = information['seeds']
+    return [(start, start + length)
+            for start, length in zip(seeds[0::2], seeds[1::2])]
+
+
+def map_seed_ranges(information: dict, intervals) -> list[Interval]:
+    ''' Push seed intervals through every section, seed to location.
+        The cost grows with the number of intervals and triples,
+        not with the number of seeds they contain.
+    '''
+    for triples in chain(information):
+        intervals = map_intervals(intervals, triples)
+    return intervals
+
+
+def section_pieces(triples) -> tuple[list[int], list[int]]:
+    ''' Describe one section as a piecewise-linear map over 0, 1, 2, ...
+        Piece k covers [starts[k], starts[k + 1]) (the last piece is unbounded)
+        and sends i to i + offsets[k].
+        Numbers outside every source range form pieces with offset 0.
+    '''
+    starts, offsets = [], []
+    i = 0
+    for a, b, c in sorted(triples, key=lambda triple: triple[1]):
+        if i < b:
+            starts.append(i)
+            offsets.append(0)
+        starts.append(b)
+        offsets.append(a - b)
+        i = b + c
+    starts.append(i)
+    offsets.append(0)
+    return merge_pieces(starts, offsets)
+
+
+def merge_pieces(starts, offsets) -> tuple[list[int], list[int]]:
+    ''' Drop empty pieces and join neighbours that share an offset.
+    '''
+    merged_starts, merged_offsets = [], []
+    for k, (start, offset) in enumerate(zip(starts, offsets)):
+        if k + 1 < len(starts) and starts[k + 1] == start:
+            continue
+        if merged_offsets and merged_offsets[-1] == offset:
+            continue
+        merged_starts.append(start)
+        merged_offsets.append(offset)
+    return merged_starts, merged_offsets
+
+
+def compose_pieces(first, second) -> tuple[list[int], list[int]]:
+    ''' The piecewise-linear map that applies `first`, then `second`.
+        Each piece of `first` is cut wherever its image
+        crosses a breakpoint of `second`.
+    '''
+    starts1, offsets1 = first
+    starts2, offsets2 = second
+    starts, offsets = [], []
+    for k, (start, offset) in enumerate(zip(starts1, offsets1)):
+        stop = starts1[k + 1] if k + 1 < len(starts1) else inf
+        lo, hi = start + offset, stop + offset
+        j = bisect_right(starts2, lo) - 1
+        while True:
+            starts.append(max(lo, starts2[j]) - offset)
+            offsets.append(offset + offsets2[j])
+            j += 1
+            if j == len(starts2) or starts2[j] >= hi:
+                break
+    return merge_pieces(starts, offsets)
+
+
+def compile_almanac(information: dict):
+    ''' Fold every section, seed to location, into a single sorted table.
+        Returns the seed-to-location callable
+        along with its breakpoints and offsets,
+        so that a lookup is one bisection instead of seven linear scans.
+    '''
+    pieces = [0], [0]
+    for triples in chain(information):
+        pieces = compose_pieces(pieces, section_pieces(triples))
+    starts, offsets = pieces
+    return PiecewiseMap(starts, offsets), starts, offsets
+
+
+class PiecewiseMap:
+    ''' i -> i + offsets[k], where piece k covers [starts[k], starts[k + 1]).
+        (A class rather than a closure, so that it can be pickled.)
+    '''
+
+    def __init__(self, starts, offsets):
+        self.starts  = starts
+        self.offsets = offsets
+
+    def __call__(self, i: int) -> int:
+        return i + self.offsets[bisect_right(self.starts, i) - 1]
+
+
+def seeds_to_locations(information: dict, seeds) -> array:
+    ''' Map a whole batch of seed numbers to location numbers,
+        with one lookup in the compiled almanac per seed.
+        Results are unsigned 64-bit, since almanac numbers exceed 2**32.
+    '''
+    seed2location, starts, offsets = compiled_almanac(information)
+    return array('Q', map(seed2location, seeds))
+
+
+# The chain of section mappings, built once in each worker process.
+_worker_chain = []
+
+
+def _init_worker(information: dict):
+    _worker_chain[:] = [mapping_from_triples(triples)
+                        for triples in chain(information)]
+
+
+def _scan_chunk(chunk: Interval) -> tuple[int, int]:
+    ''' The lowest location over one chunk of seeds, seed by seed,
+        and how many seeds were scanned.
+    '''
+    lo, hi = chunk
+    lowest = inf
+    for i in range(lo, hi):
+        for mapping in _worker_chain:
+            i = mapping(i)
+        if i < lowest:
+            lowest = i
+    return lowest, hi - lo
+
+
+def brute_force_seed_ranges(information: dict, processes=None,
+                            chunk_size=1_000_000, progress=sys.stderr):
+    ''' The lowest location over the seed ranges, found the slow way:
+        by sending every single seed through every section.
+        Seed ranges are cut into chunks of at most `chunk_size` seeds,
+        which are scanned in a pool of worker processes.
+        Progress and throughput go to `progress` (pass None for silence).
+    '''
+    chunks = [(lo, min(lo + chunk_size, hi))
+              for lo, hi in seed_ranges(information)
+              for lo in range(lo, hi, chunk_size)]
+    total = sum(hi - lo for lo, hi in chunks)
+    lowest, done = inf, 0
+    started = time.perf_counter()
+    with Pool(processes, _init_worker, (information,)) as pool:
+        for chunk_lowest, count in pool.imap_unordered(_scan_chunk, chunks):
+            lowest = min(lowest, chunk_lowest)
+            done += count
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                print(f'\r{done}/{total} seeds'
+                      f' ({done / elapsed:,.0f} seeds/s)',
+                      end='', file=progress, flush=True)
+    if progress is not None:
+        print(file=progress)
+    return lowest
+
+
 def test1():
     information = parse_almanac(test_input)
     seeds = information['seeds']
@@ -125,7 +386,7 @@ def test1():
 
     sections = information['sections']
 
-    assert sections['seed', 'soil'] == [
+    assert list(sections['seed', 'soil']) == [
         (50, 98,  2),  # The first line indicates 
                        # a source range starting at 98
                        # and a destination range starting at 50,
@@ -162,10 +423,31 @@ def test1():
     # Seed 55, soil 57, fertilizer 57, water 53, light 46, temperature 82, humidity 82, location 86.
     # Seed 13, soil 13, fertilizer 52, water 41, light 34, temperature 34, humidity 35, location 35.
 
-    seed2location = lambda i: make_seed2location(information, i)
-    location_numbers = [seed2location(i) for i in information['seeds']]
+    seed2location = seed2location_pipeline(information)
+    location_numbers = seeds_to_locations(information, information['seeds'])
+    assert location_numbers.tolist() == [82, 43, 86, 35]
     assert min(location_numbers) == 35
 
+    # The compiled almanac agrees with the chain of seven sections.
+    compiled, starts, offsets = compile_almanac(information)
+    assert starts == sorted(starts) and starts[0] == 0
+    batch = seeds_to_locations(information, range(199, -1, -1))
+    for i in range(200):
+        assert batch[199 - i] == compiled(i) == humidity2location(
+                               temperature2humidity(
+                                light2temperature(
+                                 water2light(
+                                  fertilizer2water(
+                                   soil2fertilizer(
+                                    seed2soil(i))))))), i
+    # ... and it is only compiled once,
+    assert seed2location_pipeline(information) is seed2location
+    assert make_seed2location(information, 79) == 82
+    # ... unless the almanac changes.
+    assert make_seed2location(information, 100) == 100
+    information['sections']['seed', 'soil'].append((81, 100, 1))
+    assert make_seed2location(information, 100) == 82
+    assert seed2location_pipeline(information) is not seed2location
 
 
 
@@ -174,16 +456,83 @@ def part1():
         that corresponds to one of the initial seed numbers?
     '''
     with open('day-5/input.txt') as file:
-        almanac = ''.join(file)
-    information = parse_almanac(almanac)
-    print(information)
-    seed2location = lambda i: make_seed2location(information, i)
-    location_numbers = [seed2location(i) for i in information['seeds']]
+        information = parse_almanac(file)
+    location_numbers = seeds_to_locations(information, information['seeds'])
     return min(location_numbers)
 
 
+def test2():
+    information = parse_almanac(test_input)
+    # The first range starts with seed number 79 and contains 14 values.
+    # The second range starts with seed number 55 and contains 13 values.
+    assert seed_ranges(information) == [(79, 93), (55, 68)]
+
+    # Mapping intervals agrees with mapping seeds one at a time.
+    section = information['sections']['seed', 'soil']
+    mapping = mapping_from_triples(section)
+    for lo, hi in [(0, 100), (45, 55), (97, 103), (98, 99)]:
+        mapped = map_intervals([(lo, hi)], section)
+        assert sorted(i for a, b in mapped for i in range(a, b)) \
+            == sorted(map(mapping, range(lo, hi)))
+
+    # The lowest location number is 46.
+    intervals = map_seed_ranges(information, seed_ranges(information))
+    assert min(lo for lo, hi in intervals) == 46
+    assert brute_force_seed_ranges(information, processes=2, chunk_size=5,
+                                   progress=None) == 46
+
+
+def part2():
+    ''' Consider all of the initial seed numbers listed
+        in the ranges on the first line of the almanac.
+        What is the lowest location number
+        that corresponds to any of the initial seed numbers?
+    '''
+    with open('day-5/input.txt') as file:
+        information = parse_almanac(file)
+    intervals = map_seed_ranges(information, seed_ranges(information))
+    return min(lo for lo, hi in intervals)
+
+
+def generate(size: int, seed: int = 0, seeds: int = 10):
+    ''' A made-up almanac, one line at a time,
+        with `seeds` seed ranges and `size` ranges in each map.
+        Numbers go up to 2**32, as they do in real almanacs.
+        The same seed always gives the same almanac.
+    '''
+    rng = random.Random(seed)
+    limit = 2 ** 32
+    yield 'seeds: ' + ' '.join(f'{rng.randrange(limit)}'
+                               f' {rng.randrange(1, limit // (8 * seeds))}'
+                               for _ in range(seeds)) + '\n'
+    step = limit // size
+    for src, dest in zip(categories, categories[1:]):
+        yield '\n'
+        yield f'{src}-to-{dest} map:\n'
+        for k in range(size):
+            # Source ranges stay apart; destinations may land anywhere
+            b = k * step + rng.randrange(step // 4)
+            c = rng.randrange(1, step // 2)
+            a = rng.randrange(limit - c)
+            yield f'{a} {b} {c}\n'
+
+
+def load(path) -> dict:
+    with open(path) as file:
+        return parse_almanac(file)
+
+
+def solve(information: dict, part: int) -> int:
+    if part == 1:
+        return min(seeds_to_locations(information, information['seeds']))
+    intervals = map_seed_ranges(information, seed_ranges(information))
+    return min(lo for lo, hi in intervals)
+
+
 if __name__ == '__main__':
     test1()
     print(f'Part 1 {part1()}')
+    test2()
+    print(f'Part 2 {part2()}')
 
 
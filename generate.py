@@ -0,0 +1,41 @@
+#!python3
+''' Write a made-up puzzle input for one day, of any size.
+
+    python generate.py 4 1000000 --seed 7 --output cards.txt
+
+    Each day-N/DayN.py provides `generate(size, seed)`,
+    which yields the lines of an input one at a time,
+    so inputs far bigger than memory can be written.
+    The same day, size and seed always give the same input.
+'''
+import argparse
+import sys
+from pathlib import Path
+
+from runner import discover, load_day
+
+
+def write(day: int, size: int, seed: int, file):
+    for line in load_day(day).generate(size, seed):
+        file.write(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('day', type=int, choices=list(discover()))
+    parser.add_argument('size', type=int,
+                        help='how many lines, records or map ranges')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path,
+                        help='where to write the input (default: stdout)')
+    args = parser.parse_args(argv)
+
+    if args.output is None:
+        write(args.day, args.size, args.seed, sys.stdout)
+    else:
+        with open(args.output, 'w') as file:
+            write(args.day, args.size, args.seed, file)
+
+
+if __name__ == '__main__':
+    main()
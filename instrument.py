@@ -0,0 +1,253 @@
+#!python3
+''' Opt-in instrumentation of the solvers' hot functions,
+    and profiling of whole runs.
+
+    `instrument()` swaps timed wrappers into the day modules
+    for as long as it is active, counting calls, time and items;
+    nothing in the modules changes otherwise,
+    so when it is not in use it costs nothing at all.
+    `profile()` records a run with cProfile,
+    and `sample_stacks()` samples the running stack every so often
+    and writes the samples in the collapsed format
+    that flame graph tools read ("a;b;c 42" per line).
+
+    python runner.py --instrument --profile run.pstats --stacks run.folded
+'''
+import cProfile
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from runner import default_input, discover, load_day, run
+
+# The functions that each day's `load` and `solve` go through, by day;
+# methods as Class.method, and functions kept in a dict as name[key].
+# Functions returning iterators are timed as they are consumed.
+hot_functions = {
+    1: ['calibrations[1]', 'calibrations[2]'],
+    2: ['parse_game_bytes', 'GameTable.game_is_possible',
+        'GameTable.minimal_cube_sets', 'GameTable.powers'],
+    3: ['read_schematic', 'scan_grid'],
+    4: ['parse_card_bytes', 'CardStore.match_counts', 'CardStore.summary',
+        'count_instances'],
+    5: ['parse_almanac', 'compile_almanac', 'seeds_to_locations',
+        'map_intervals'],
+}
+
+# How many items one call works through, where that is not simply one,
+# given what the call returned and its arguments
+items_per_call = {
+    'Day2.game_is_possible':
+        lambda possible, game, bag: len(game),
+    'Day2.GameTable.game_is_possible':
+        lambda possible, table, bag: len(table),
+    'Day2.GameTable.minimal_cube_sets':
+        lambda columns, table: len(table),
+    'Day2.GameTable.powers':
+        lambda powers, table: len(table),
+    'Day3.read_schematic':
+        lambda rows, path: len(rows),
+    'Day3.scan_grid':
+        lambda found, rows: len(rows),
+    'Day4.CardStore.match_counts':
+        lambda counts, store: len(store),
+    'Day4.count_instances':
+        lambda instances, summary: len(instances),
+    'Day5.compile_almanac':
+        lambda compiled, information:
+            sum(map(len, information['sections'].values())),
+    'Day5.seeds_to_locations':
+        lambda locations, information, seeds: len(locations),
+    'Day5.map_intervals':
+        lambda mapped, intervals, triples: len(intervals),
+}
+
+
+class Stats(dict):
+    ''' Calls, cumulative seconds and items processed, by function.
+    '''
+
+    def record(self, name: str, seconds: float, calls=0, items=0):
+        entry = self.setdefault(name, {'calls': 0, 'seconds': 0.0,
+                                       'items': 0})
+        entry['calls']   += calls
+        entry['seconds'] += seconds
+        entry['items']   += items
+
+
+def timed(name: str, function, stats: Stats):
+    count_items = items_per_call.get(name)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        seconds = time.perf_counter() - started
+        if hasattr(result, '__next__'):
+            stats.record(name, seconds, calls=1)
+            return timed_iterator(name, result, stats)
+        items = count_items(result, *args, **kwargs) if count_items else 1
+        stats.record(name, seconds, calls=1, items=items)
+        return result
+
+    return wrapper
+
+
+def timed_iterator(name: str, iterator, stats: Stats):
+    ''' `iterator`, with the time spent in it and its items recorded.
+    '''
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats.record(name, time.perf_counter() - started)
+            return
+        stats.record(name, time.perf_counter() - started, items=1)
+        yield item
+
+
+def timed_factory(name: str, factory, product: str, stats: Stats):
+    ''' Wrap `factory`, and time each function it makes as `product`.
+        (This is how the `mapping` inside `mapping_from_triples` is timed.)
+    '''
+
+    @wraps(factory)
+    def wrapper(*args, **kwargs):
+        return timed(product, factory(*args, **kwargs), stats)
+
+    return wrapper
+
+
+@contextmanager
+def instrument(days=None, functions=hot_functions):
+    ''' Time the `functions` of `days` (all of them by default)
+        while the block runs, collecting into the `Stats` it yields.
+    '''
+    stats = Stats()
+    patched = []
+    try:
+        for day, names in functions.items():
+            if days is not None and day not in days:
+                continue
+            module = load_day(day)
+            for name in names:
+                if match := re.fullmatch(r'(\w+)\[(\d+)\]', name):
+                    owner, attribute = vars(module)[match[1]], int(match[2])
+                    original = owner[attribute]
+                else:
+                    *owner, attribute = name.split('.')
+                    owner = getattr(module, owner[0]) if owner else module
+                    original = owner.__dict__[attribute]
+                full_name = f'{module.__name__}.{name}'
+                if name == 'mapping_from_triples':
+                    wrapper = timed_factory(full_name, original,
+                                            f'{module.__name__}.mapping',
+                                            stats)
+                else:
+                    wrapper = timed(full_name, original, stats)
+                patch(owner, attribute, wrapper)
+                patched.append((owner, attribute, original))
+        yield stats
+    finally:
+        for owner, attribute, original in reversed(patched):
+            patch(owner, attribute, original)
+
+
+def patch(owner, attribute, value):
+    if isinstance(owner, dict):
+        owner[attribute] = value
+    else:
+        setattr(owner, attribute, value)
+
+
+@contextmanager
+def profile(path):
+    ''' Record the block with cProfile, and write the stats to `path`
+        (for `python -m pstats`, snakeviz and the like).
+    '''
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+@contextmanager
+def sample_stacks(path, interval=0.001):
+    ''' Sample the stack of the calling thread every `interval` seconds
+        while the block runs, and write the samples to `path`
+        as collapsed stacks, ready for flamegraph.pl or speedscope.
+    '''
+    target = threading.get_ident()
+    samples = Counter()
+    done = threading.Event()
+
+    def sampler():
+        while not done.wait(interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name}'
+                             f' ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                samples[';'.join(reversed(stack))] += 1
+
+    thread = threading.Thread(target=sampler, daemon=True)
+    thread.start()
+    try:
+        yield samples
+    finally:
+        done.set()
+        thread.join()
+        with open(path, 'w') as file:
+            for stack, count in samples.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+def test():
+    Day3 = load_day(3)
+    original = Day3.spans_are_adjacent
+    schematic = Day3.test_input.split('\n')
+    spans = [*Day3.get_number_spans(schematic)]
+    functions = {3: ['neighbours', 'spans_are_adjacent'],
+                 5: ['mapping_from_triples']}
+    with instrument(days=[3, 5], functions=functions) as stats:
+        assert Day3.spans_are_adjacent is not original
+        those = [*Day3.get_symbol_spans(schematic)]
+        found = [*Day3.neighbours(spans[0], those)]
+        Day5 = load_day(5)
+        mapping = Day5.mapping_from_triples([(50, 98, 2)])
+        assert mapping(98) == 50
+    assert Day3.spans_are_adjacent is original
+    assert stats['Day3.spans_are_adjacent']['calls'] == len(those)
+    assert stats['Day3.neighbours']['items'] == len(found)
+    assert stats['Day5.mapping']['calls'] == 1
+
+    # Every day's own hot functions are on the runner's path
+    Day1 = load_day(1)
+    original = Day1.calibrations[2]
+    every = Stats()
+    for day in discover():
+        with instrument(days=[day]) as stats:
+            for part in (1, 2):
+                run(day, part, default_input(day))
+        assert any(name.startswith(f'Day{day}.') for name in stats), day
+        every |= stats
+    assert Day1.calibrations[2] is original
+    # ... and those working through many items count them
+    for name in items_per_call:
+        if name in every:
+            assert every[name]['items'] > every[name]['calls'], name
+
+
+if __name__ == '__main__':
+    test()
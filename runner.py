@@ -0,0 +1,188 @@
+#!python3
+''' Run the solvers of chosen days and parts on chosen inputs,
+    timing the parse and the solve separately,
+    and report the results as JSON.
+
+    python runner.py                        # Every day, both parts
+    python runner.py --days 3 5 --parts 2
+    python runner.py --days 4 --input big.txt --output report.json
+    python runner.py --input 2=games.txt 4=cards.txt
+    python runner.py --cache                # Reuse answers to unchanged inputs
+    python runner.py --instrument --stacks run.folded
+
+    Each day-N/DayN.py provides `load(path)`, which parses an input file,
+    and `solve(parsed, part)`, which answers one part.
+    A run that fails is reported with its error, and the others still run.
+'''
+import argparse
+import importlib.util
+import json
+import platform
+import re
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from cache import AnswerCache, default_path, file_digest, solver_version
+
+root = Path(__file__).resolve().parent
+
+
+def discover() -> dict[int, Path]:
+    ''' The solver module of each day, by day number.
+    '''
+    days = {}
+    for path in root.glob('day-*/Day*.py'):
+        match = re.fullmatch(r'Day(\d+)\.py', path.name)
+        if match is not None and path.parent.name == f'day-{match.group(1)}':
+            days[int(match.group(1))] = path
+    return dict(sorted(days.items()))
+
+
+def load_day(day: int):
+    ''' Import the solver module of `day`.
+        It is registered under its own name (Day5, say),
+        so that worker processes can find its functions.
+    '''
+    name = f'Day{day}'
+    if name not in sys.modules:
+        path = discover()[day]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+def default_input(day: int) -> Path:
+    return root / f'day-{day}' / 'input.txt'
+
+
+def run(day: int, part: int, path, cache=None, cache_parsed=False) -> dict:
+    ''' Parse `path` and solve one part of `day`, timing each stage.
+        With an `AnswerCache`, a known answer is looked up instead,
+        and with `cache_parsed` so is the parsed input.
+    '''
+    module = load_day(day)
+    record = {'day': day, 'part': part, 'input': str(path)}
+    if cache is not None:
+        started = time.perf_counter()
+        version, digest = solver_version(module), file_digest(path)
+        answer_key = cache.key(day, part, version, digest)
+        answer = cache.get(answer_key)
+        record['lookup_seconds'] = time.perf_counter() - started
+        if answer is not None:
+            return record | {'answer': answer, 'cached': True}
+
+    started = time.perf_counter()
+    if cache is not None and cache_parsed:
+        parsed_key = cache.key(day, 'parsed', version, digest)
+        parsed = cache.get(parsed_key)
+        if parsed is None:
+            parsed = module.load(path)
+            cache.put(parsed_key, parsed)
+    else:
+        parsed = module.load(path)
+    parsed_at = time.perf_counter()
+    answer = module.solve(parsed, part)
+    solved_at = time.perf_counter()
+    if cache is not None:
+        cache.put(answer_key, answer)
+        record['cached'] = False
+    return record | {'answer': answer,
+                     'parse_seconds': parsed_at - started,
+                     'solve_seconds': solved_at - parsed_at}
+
+
+def attempt(day: int, part: int, path, cache=None, cache_parsed=False) -> dict:
+    ''' `run`, or a record of the error that stopped it.
+    '''
+    try:
+        return run(day, part, path, cache, cache_parsed)
+    except Exception as error:
+        return {'day': day, 'part': part, 'input': str(path),
+                'error': f'{type(error).__name__}: {error}'}
+
+
+def inputs_by_day(specs: list[str], days) -> dict[int, Path]:
+    ''' Input files given as DAY=PATH, by day;
+        or one bare PATH, for the only day chosen.
+    '''
+    inputs = {}
+    for spec in specs:
+        match = re.fullmatch(r'(\d+)=(.+)', spec)
+        if match is not None:
+            inputs[int(match.group(1))] = Path(match.group(2))
+        elif days is not None and len(days) == 1 and len(specs) == 1:
+            inputs[days[0]] = Path(spec)
+        else:
+            raise ValueError(f'{spec!r}: give inputs as DAY=PATH,'
+                             ' or one PATH for one day')
+    return inputs
+
+
+def report(runs: list[dict]) -> dict:
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': runs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--days', type=int, nargs='+',
+                        help='days to run (default: all of them)')
+    parser.add_argument('--parts', type=int, nargs='+', default=[1, 2],
+                        choices=[1, 2])
+    parser.add_argument('--input', nargs='+', default=[],
+                        metavar='DAY=PATH',
+                        help='input files, by day (default: day-N/input.txt);'
+                             ' one bare PATH will do for a single day')
+    parser.add_argument('--output', type=Path,
+                        help='where to write the report (default: stdout)')
+    parser.add_argument('--cache', type=Path, nargs='?', const=default_path,
+                        help='reuse answers from this cache'
+                             f' (default: {default_path.name})')
+    parser.add_argument('--cache-parsed', action='store_true',
+                        help='cache parsed inputs as well as answers')
+    parser.add_argument('--instrument', action='store_true',
+                        help='count calls, time and items of hot functions')
+    parser.add_argument('--profile', type=Path,
+                        help='write cProfile stats of the run here')
+    parser.add_argument('--stacks', type=Path,
+                        help='write sampled stacks of the run here,'
+                             ' in collapsed (flame graph) format')
+    args = parser.parse_args(argv)
+    try:
+        inputs = inputs_by_day(args.input, args.days)
+    except ValueError as error:
+        parser.error(str(error))
+
+    # Imported here, since instrument itself imports this module
+    from instrument import instrument, profile, sample_stacks
+
+    cache = AnswerCache(args.cache) if args.cache else None
+    days = args.days or list(inputs) or list(discover())
+    with ExitStack() as stack:
+        if args.instrument:
+            stats = stack.enter_context(instrument(days))
+        if args.profile:
+            stack.enter_context(profile(args.profile))
+        if args.stacks:
+            stack.enter_context(sample_stacks(args.stacks))
+        runs = [attempt(day, part, inputs.get(day) or default_input(day),
+                        cache, args.cache_parsed)
+                for day in days for part in args.parts]
+    results = report(runs)
+    if args.instrument:
+        results['instrumentation'] = stats
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + '\n')
+    return 1 if any('error' in record for record in runs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
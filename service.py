@@ -0,0 +1,297 @@
+#!python3
+''' A long-running solver service on a Unix socket,
+    which keeps modules, parsed inputs and compiled state warm
+    between requests.
+
+    python service.py serve --socket /tmp/aoc.sock --workers 4
+    python service.py ask --socket /tmp/aoc.sock --day 5 --part 2
+    python service.py ask --day 2 --bags '[{"red": 12, "green": 13, "blue": 14}]'
+
+    Requests and responses are JSON objects, one per line.
+    A request names a `day` and a `part`, and gives its input
+    either as a `path` or inline as a `payload` string
+    (with neither, the day's own input.txt is used);
+    for Day 2, `bags` asks which games fit each of a list of bags instead.
+    Any `id` in a request is echoed in its response,
+    since responses come back as soon as they are ready, in any order.
+
+    Answers are remembered by the SHA-256 of the input,
+    so repeating a request costs a hash and a lookup.
+    Solving happens in a pool of worker processes,
+    each of which imports every day once (compiling its patterns
+    and automata) and keeps recently parsed inputs,
+    along with what is built from them:
+    the Day 5 compiled almanac, the Day 2 bag index and so on.
+'''
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from runner import default_input, discover, load_day
+
+default_socket = Path(tempfile.gettempdir()) / 'aoc2023.sock'
+
+
+class LRU(OrderedDict):
+    ''' A dict holding its most recently used items,
+        up to a total weight of `size` (each item weighing 1 by default).
+    '''
+
+    def __init__(self, size: int):
+        super().__init__()
+        self.size = size
+        self.weights = {}
+        self.total = 0
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def put(self, key, value, weight=1):
+        self.total += weight - self.weights.get(key, 0)
+        self.weights[key] = weight
+        self[key] = value
+        self.move_to_end(key)
+        while self.total > self.size:
+            oldest, _ = self.popitem(last=False)
+            self.total -= self.weights.pop(oldest)
+
+
+# In each worker: parsed inputs, by (day, digest),
+# weighed by the size of their input, and bag indexes, by digest
+_parsed  = LRU(64 * 2 ** 20)
+_indexes = LRU(16)
+
+
+def _warm():
+    for day in discover():
+        load_day(day)
+
+
+def _parse(day: int, digest: str, path=None, payload=None):
+    key = day, digest
+    if (parsed := _parsed.get(key)) is None:
+        module = load_day(day)
+        if payload is None:
+            parsed = module.load(path)
+            size = os.path.getsize(path)
+        else:
+            size = len(payload)
+            with tempfile.NamedTemporaryFile('w', suffix='.txt') as file:
+                file.write(payload)
+                file.flush()
+                parsed = module.load(file.name)
+        _parsed.put(key, parsed, size)
+    return parsed
+
+
+def _solve(day: int, part: int, digest: str, path=None, payload=None):
+    parsed = _parse(day, digest, path, payload)
+    return load_day(day).solve(parsed, part)
+
+
+def _query_bags(digest: str, bags, path=None, payload=None):
+    table = _parse(2, digest, path, payload)
+    if (index := _indexes.get(digest)) is None:
+        index = load_day(2).BagIndex(table)
+        _indexes.put(digest, index)
+    return index.query(bags)
+
+
+def digest_of(path=None, payload=None) -> str:
+    digest = hashlib.sha256()
+    if payload is not None:
+        digest.update(payload.encode())
+    else:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(2 ** 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class Service:
+
+    def __init__(self, workers=None, answers=4096):
+        self.pool = ProcessPoolExecutor(workers, get_context('spawn'),
+                                        initializer=_warm)
+        self.answers = LRU(answers)
+        self.submitted = 0  # Tasks sent to the pool
+
+    async def answer(self, request: dict):
+        day = int(request['day'])
+        if day not in discover():
+            raise ValueError(f'no solver for day {day}')
+        payload = request.get('payload')
+        path = None
+        if payload is None:
+            path = str(request.get('path') or default_input(day))
+        digest = await asyncio.to_thread(digest_of, path, payload)
+
+        bags = request.get('bags')
+        if bags is not None:
+            if day != 2:
+                raise ValueError('only day 2 takes bags')
+            key = day, 'bags', json.dumps(bags, sort_keys=True), digest
+            task = _query_bags, digest, bags, path, payload
+        else:
+            part = int(request['part'])
+            if part not in (1, 2):
+                raise ValueError(f'no part {part}')
+            key = day, part, digest
+            task = _solve, day, part, digest, path, payload
+
+        if (answer := self.answers.get(key)) is None:
+            loop = asyncio.get_running_loop()
+            self.submitted += 1
+            answer = await loop.run_in_executor(self.pool, *task)
+            self.answers.put(key, answer)
+        return answer
+
+    async def respond(self, line: bytes, writer, lock):
+        started = time.perf_counter()
+        response = {}
+        try:
+            request = json.loads(line)
+            if 'id' in request:
+                response['id'] = request['id']
+            response['answer'] = await self.answer(request)
+        except Exception as error:
+            response['error'] = f'{type(error).__name__}: {error}'
+        response['seconds'] = time.perf_counter() - started
+        async with lock:
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(
+                        self.respond(line, writer, lock))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def serve(self, path=default_socket):
+        path = Path(path)
+        path.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self.handle, path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def ask(requests: list[dict], path=default_socket) -> list[dict]:
+    ''' Send `requests` to the service at `path`,
+        and return the responses in the order of the requests.
+    '''
+    requests = [request | {'id': n} for n, request in enumerate(requests)]
+    with socket.socket(socket.AF_UNIX) as connection:
+        connection.connect(str(path))
+        for request in requests:
+            connection.sendall(json.dumps(request).encode() + b'\n')
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile('rb') as responses:
+            responses = [json.loads(line) for line in responses]
+    return sorted(responses, key=lambda response: response['id'])
+
+
+def test():
+    async def check(path):
+        service = Service(workers=2)
+        server = asyncio.create_task(service.serve(path))
+        while not path.exists():
+            await asyncio.sleep(0.01)
+        requests = [{'day': day, 'part': part}
+                    for day in discover() for part in (1, 2)]
+        requests.append({'day': 2,
+                         'bags': [{'red': 12, 'green': 13, 'blue': 14}]})
+        requests.append({'day': 4, 'part': 2,
+                         'payload': load_day(4).test_input})
+        requests.append({'day': 6, 'part': 1})
+        cold = await asyncio.to_thread(ask, requests, path)
+        submitted = service.submitted
+        warm = await asyncio.to_thread(ask, requests, path)
+        server.cancel()
+        service.close()
+        # Every answer but the error was solved once, then remembered
+        assert submitted == len(requests) - 1
+        assert service.submitted == submitted
+        return cold, warm
+
+    with tempfile.TemporaryDirectory() as directory:
+        cold, warm = asyncio.run(check(Path(directory) / 'test.sock'))
+    for before, after in zip(cold, warm):
+        assert before.get('answer') == after.get('answer'), (before, after)
+    answers = {(response['id']): response.get('answer') for response in warm}
+    assert answers[2] == 2268                   # Day 2 part 1
+    (ids, total), = answers[len(answers) - 3]
+    assert total == 2268
+    assert answers[len(answers) - 2] == 30      # Day 4 example, part 2
+    assert 'error' in warm[-1]                  # There is no day 6 yet
+
+    parsed = LRU(10)
+    for key in 'abc':
+        parsed.put(key, key.upper(), 4)
+    assert list(parsed) == ['b', 'c'] and parsed.total == 8
+    parsed.put('b', 'B', 1)
+    assert list(parsed) == ['c', 'b'] and parsed.total == 5
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run the service')
+    serve.add_argument('--socket', type=Path, default=default_socket)
+    serve.add_argument('--workers', type=int)
+    request = commands.add_parser('ask', help='send the service a request')
+    request.add_argument('--socket', type=Path, default=default_socket)
+    request.add_argument('--day', type=int, required=True)
+    request.add_argument('--part', type=int, default=1)
+    request.add_argument('--input', type=Path)
+    request.add_argument('--bags', type=json.loads,
+                         help='a JSON list of bags (Day 2)')
+    commands.add_parser('test', help='check the service end to end')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        service = Service(args.workers)
+        try:
+            asyncio.run(service.serve(args.socket))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+    elif args.command == 'ask':
+        message = {'day': args.day, 'part': args.part}
+        if args.input is not None:
+            message['path'] = str(args.input.resolve())
+        if args.bags is not None:
+            message['bags'] = args.bags
+        response, = ask([message], args.socket)
+        print(json.dumps(response))
+        return 'error' in response
+    else:
+        test()
+
+
+if __name__ == '__main__':
+    sys.exit(main())